@@ -31,6 +31,8 @@ def gui_entrypoint(*args, **kwargs):
         frm.init_params = kwargs
         frm.Show()
         app.MainLoop()
+        if frm.init_exception:
+            raise frm.init_exception
     except Exception as e:
         LoggingHandler.get().exception_hook = None
         exception(None, exc_info=e)
@@ -12,13 +12,33 @@ from .window import BaseWindow
 # noinspection PyPep8Naming
 class BasePanel(wx.Panel, BaseWindow):
     _components: list[wx.Window]
+    _window_by_name: dict[str, wx.Window]
+    _update_timer: wx.CallLater | None = None
+    _pending_target: wx.Window | None = None
+    _xrc: wx.xrc.XmlResource | None = None
 
     def __init__(self, parent: wx.Window, frame):
         super().__init__(parent)
         self.InitWindow(frame)
         self.Frame = frame
-        self.Xrc: wx.xrc.XmlResource = frame.Xrc
+        self.Xrc = frame.Xrc
         self._components = []
+        self._window_by_name = {}
+
+    @property
+    def Xrc(self) -> wx.xrc.XmlResource:
+        if self._xrc is None:
+            # released by the main frame - parse it again if needed
+            return self.Frame.Xrc
+        return self._xrc
+
+    @Xrc.setter
+    def Xrc(self, value: wx.xrc.XmlResource | None):
+        self._xrc = value
+
+    def ReleaseXrc(self, xrc: wx.xrc.XmlResource):
+        if self._xrc is xrc:
+            self._xrc = None
 
     def OnShow(self):
         self.OnUpdate()
@@ -38,6 +58,22 @@ class BasePanel(wx.Panel, BaseWindow):
         self.OnUpdate(event.GetEventObject() if event else None)
         self._in_update = False
 
+    def _OnUpdateDebounced(self, event: wx.Event):
+        event.Skip()
+        if self._in_update:
+            return
+        # coalesce bursts of events (i.e. typing) into a single OnUpdate()
+        self._pending_target = event.GetEventObject()
+        if self._update_timer is None or not self._update_timer.IsRunning():
+            self._update_timer = wx.CallLater(30, self._FireUpdate)
+
+    def _FireUpdate(self):
+        if not self or self.is_closing:
+            return
+        target = self._pending_target
+        self._pending_target = None
+        self.DoUpdate(target)
+
     def DoUpdate(self, target: wx.Window = None):
         if self._in_update:
             return
@@ -61,6 +97,14 @@ class BasePanel(wx.Panel, BaseWindow):
         sizer = wx.BoxSizer(wx.VERTICAL)
         sizer.Add(panel, 1, wx.EXPAND)
         self.SetSizer(sizer)
+        # index all named windows to avoid walking the tree on every lookup
+        stack: list[wx.Window] = [panel]
+        while stack:
+            window = stack.pop()
+            name = window.GetName()
+            if name:
+                self._window_by_name.setdefault(name, window)
+            stack.extend(reversed(window.GetChildren()))
 
     def AddToNotebook(self, title: str):
         self.Frame.Notebook.AddPage(self, title)
@@ -71,73 +115,87 @@ class BasePanel(wx.Panel, BaseWindow):
             parent = self
         return super().FindWindowByName(name, parent)
 
+    def _FindWindow(self, name: str) -> wx.Window:
+        window = self._window_by_name.get(name, None)
+        if window:
+            return window
+        # fall back for windows created outside of LoadXRC()
+        return self.FindWindowByName(name, self)
+
     def BindByName(self, event: int, name: str, handler: Callable[[wx.Event], None]):
-        self.FindWindowByName(name, self).Bind(event, handler)
+        self._FindWindow(name).Bind(event, handler)
 
     def BindComboBox(self, name: str):
-        window: wx.ComboBox = self.FindWindowByName(name, self)
+        window: wx.ComboBox = self._FindWindow(name)
         self._components.append(window)
         # EVT_COMBOBOX fires EVT_TEXT as well
         window.Bind(wx.EVT_TEXT, self._OnUpdate)
         return window
 
     def BindListBox(self, name: str):
-        window: wx.ListBox = self.FindWindowByName(name, self)
+        window: wx.ListBox = self._FindWindow(name)
         self._components.append(window)
         window.Bind(wx.EVT_LISTBOX, self._OnUpdate)
         return window
 
     def BindRadioButton(self, name: str):
-        window: wx.RadioButton = self.FindWindowByName(name, self)
+        window: wx.RadioButton = self._FindWindow(name)
         self._components.append(window)
         window.Bind(wx.EVT_RADIOBUTTON, self._OnUpdate)
         return window
 
     def BindCheckBox(self, name: str):
-        window: wx.CheckBox = self.FindWindowByName(name, self)
+        window: wx.CheckBox = self._FindWindow(name)
         self._components.append(window)
         window.Bind(wx.EVT_CHECKBOX, self._OnUpdate)
         return window
 
     def BindTextCtrl(self, name: str):
-        window: wx.TextCtrl = self.FindWindowByName(name, self)
+        window: wx.TextCtrl = self._FindWindow(name)
         self._components.append(window)
-        window.Bind(wx.EVT_TEXT, self._OnUpdate)
+        window.Bind(wx.EVT_TEXT, self._OnUpdateDebounced)
         return window
 
     def BindButton(self, name: str, func: Callable[[wx.Event], None]):
-        window: wx.Button = self.FindWindowByName(name, self)
+        window: wx.Button = self._FindWindow(name)
         self._components.append(window)
         window.Bind(wx.EVT_BUTTON, func)
         return window
 
     def BindWindow(self, name: str, *handlers: Tuple[Any, Callable[[wx.Event], None]]):
-        window = self.FindWindowByName(name, self)
+        window = self._FindWindow(name)
         self._components.append(window)
         for event, func in handlers:
             window.Bind(event, func)
         return window
 
     def FindStaticText(self, name: str):
-        window: wx.StaticText = self.FindWindowByName(name, self)
+        window: wx.StaticText = self._FindWindow(name)
         return window
 
     def FindStaticBitmap(self, name: str):
-        window: wx.StaticBitmap = self.FindWindowByName(name, self)
+        window: wx.StaticBitmap = self._FindWindow(name)
         return window
 
+    def _SetEnabled(self, enable: bool):
+        # repaint once, after all components are changed
+        self.Freeze()
+        try:
+            for window in self._components:
+                window.Enable(enable)
+        finally:
+            self.Thaw()
+
     def EnableAll(self):
         if self.is_closing:
             return
-        for window in self._components:
-            window.Enable()
+        self._SetEnabled(True)
         self.OnUpdate()
 
     def DisableAll(self):
         if self.is_closing:
             return
-        for window in self._components:
-            window.Disable()
+        self._SetEnabled(False)
 
     def EnableFileDrop(self):
         panel = self
@@ -3,6 +3,7 @@
 import sys
 from os.path import dirname, isfile, join
 
+import wx
 import wx.xrc
 
 from ltchiptool.gui.colors import ColorPalette
@@ -16,19 +17,20 @@ class BaseWindow:
     Xrc: wx.xrc.XmlResource = None
     is_closing: bool = False
     _in_update: bool = False
-    _threads: list[BaseThread]
+    _threads: set[BaseThread]
 
     def InitWindow(self, main) -> None:
         self.Main = main
-        self._threads = []
+        self._threads = set()
 
     def StartWork(self, thread: BaseThread, freeze_ui: bool = True):
-        self._threads.append(thread)
+        self._threads.add(thread)
 
         def on_stop(t: BaseThread):
             self.OnWorkStopped(t)
             if freeze_ui:
-                self.EnableAll()
+                # called on the worker thread - update the UI on the main thread
+                wx.CallAfter(self.EnableAll)
 
         thread.on_stop = on_stop
         if freeze_ui:
@@ -41,7 +43,7 @@ class BaseWindow:
                 t.stop()
 
     def OnWorkStopped(self, t: BaseThread):
-        self._threads.remove(t)
+        self._threads.discard(t)
 
     def SetInitParams(self, **kwargs):
         pass
@@ -66,11 +68,11 @@ class BaseWindow:
 
     def LoadXRCFile(self, *path: str):
         xrc = join(*path)
-        if isfile(xrc):
-            self.Xrc = load_xrc_file(xrc)
-        else:
+        if not isfile(xrc):
             root = dirname(sys.modules[self.__module__].__file__)
-            self.Xrc = load_xrc_file(root, *path)
+            xrc = join(root, *path)
+        # resources are cached by path, so windows sharing a file share the resource
+        self.Xrc = load_xrc_file(xrc)
 
     def EnableAll(self):
         pass
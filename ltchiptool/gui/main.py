@@ -1,10 +1,16 @@
 #  Copyright (c) Kuba Szczodrzyński 2023-1-2.
 
+import json
 import sys
 import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from hashlib import blake2b
+from importlib import import_module
+from io import BytesIO
 from logging import debug, exception, info, warning
-from os import rename, unlink
+from os import rename, replace, unlink
 from os.path import dirname, isfile, join
+from typing import Callable
 
 import wx
 import wx.adv
@@ -12,17 +18,18 @@ import wx.xrc
 from click import get_app_dir
 from zeroconf import Zeroconf
 
-from ltchiptool.util.fileio import readjson, writejson
+from ltchiptool.util.fileio import readbin, readjson, writejson
 from ltchiptool.util.logging import LoggingHandler, verbose
 from ltchiptool.util.lpm import LPM
 from ltchiptool.util.lvm import LVM
+from ltctplugin.base import PluginBase
 
 from .base.frame import BaseFrame
 from .base.panel import BasePanel
 from .base.window import BaseWindow
 from .colors import ColorPalette
 from .panels.log import LogPanel
-from .utils import load_xrc_file, on_event, with_event, with_target
+from .utils import load_xrc_file, on_event, unload_xrc_file, with_event, with_target
 
 
 # noinspection PyPep8Naming
@@ -31,14 +38,30 @@ class MainFrame(wx.Frame):
     Panels: dict[str, BasePanel]
     Menus: dict[str, wx.Menu]
     MenuItems: dict[str, dict[str, wx.MenuItem]]
+    LazyPanels: dict[str, tuple[wx.Panel, str, str]]
+    XrcPath: str
     init_params: dict
+    init_exception: Exception | None = None
+    LoggingHandler: LoggingHandler
+    is_ready: bool = False
+    is_shown: bool = False
+    _swapping_page: bool = False
+    _settings_cache: dict | None = None
+    _settings_hash: bytes | None = None
+    _page_names: dict[int, str]
+    _page_indexes: dict[int, int] | None = None
+    _startup_page: str | None = None
+    _xrc: wx.xrc.XmlResource | None = None
+    _plugin_queue: list[tuple[PluginBase, Future]]
+    _menu_handlers: dict[tuple[str, str], Callable[[str, str, bool], None]]
     Zeroconf: Zeroconf = None
 
     def __init__(self, *args, **kw):
         super().__init__(*args, **kw)
+        self.LoggingHandler = LoggingHandler.get()
+        self.LoggingHandler.exception_hook = self.ShowExceptionMessage
         sys.excepthook = self.OnException
-        threading.excepthook = self.OnException
-        LoggingHandler.get().exception_hook = self.ShowExceptionMessage
+        threading.excepthook = self.OnThreadException
 
         is_bundled = getattr(sys, "frozen", False) and hasattr(sys, "_MEIPASS")
         if is_bundled:
@@ -48,8 +71,6 @@ class MainFrame(wx.Frame):
             xrc = join(dirname(__file__), "ltchiptool.xrc")
             icon = join(dirname(__file__), "ltchiptool.ico")
 
-        self.Xrc = load_xrc_file(xrc)
-
         try:
             # try to find LT directory or local data snapshot
             LVM.get().require_version()
@@ -67,96 +88,168 @@ class MainFrame(wx.Frame):
             rename(old_config, self.config_file)
         self.loaded = False
         self.Windows = self.Panels = {}
+        self.LazyPanels = {}
+        self._page_names = {}
+        self._menu_handlers = {}
         self.init_params = {}
 
+        # show an empty window first, build everything else after it's drawn
+        self._init_minimal(icon)
+        wx.CallAfter(self._init_deferred, xrc, is_bundled)
+
+    def _init_minimal(self, icon: str) -> None:
         # main window layout
         self.Sizer = wx.BoxSizer(wx.VERTICAL)
         self.Splitter = wx.SplitterWindow(self, style=wx.SP_3D | wx.SP_LIVE_UPDATE)
         # build splitter panes
         self.Notebook = wx.Notebook(parent=self.Splitter)
         self.Notebook.SetMinSize((-1, 400))
-        self.Log = LogPanel(parent=self.Splitter, frame=self)
         # initialize the splitter
         self.Splitter.SetMinimumPaneSize(150)
         self.Splitter.SetSashGravity(0.7)
-        self.Splitter.SplitHorizontally(self.Notebook, self.Log, sashPosition=-300)
+        self.Splitter.Initialize(self.Notebook)
         self.Sizer.Add(self.Splitter, proportion=1, flag=wx.EXPAND)
         self.SetSizer(self.Sizer)
-        self.Windows["log"] = self.Log
 
-        # list all built-in panels
-        from .panels.about import AboutPanel
-        from .panels.flash import FlashPanel
-        from .panels.plugins import PluginsPanel
+        self.Bind(wx.EVT_SHOW, self.OnShow)
+        self.Bind(wx.EVT_CLOSE, self.OnClose)
+        self.Bind(wx.EVT_MENU, self.OnMenu)
+        self.Notebook.Bind(wx.EVT_NOTEBOOK_PAGE_CHANGING, self.OnPageChanging)
+        self.Notebook.Bind(wx.EVT_NOTEBOOK_PAGE_CHANGED, self.OnPageChanged)
 
-        windows = [
-            ("flash", FlashPanel),
-            ("plugins", (not is_bundled) and PluginsPanel),
-            ("about", AboutPanel),
-        ]
+        self.SetSize((700, 800))
+        self.SetMinSize((600, 700))
+        self.CreateStatusBar()
+        # read the icon file in the background, set it when it's ready
+        threading.Thread(target=self._LoadIcon, args=(icon,), daemon=True).start()
 
-        # load all panels from plugins
-        lpm = LPM.get()
-        for plugin in sorted(lpm.plugins, key=lambda p: p.title):
-            if not plugin.is_compatible:
-                continue
-            if not plugin.has_gui:
-                continue
-            for gui_name, cls in plugin.build_gui().items():
-                windows.append((f"plugin.{plugin.namespace}.{gui_name}", cls))
+    def _LoadIcon(self, icon: str) -> None:
+        try:
+            data = readbin(icon)
+        except OSError as e:
+            warning(f"Couldn't load the app icon: {e}")
+            return
+        wx.CallAfter(self._SetIconData, data)
 
-        # dummy name for exception messages
-        name = "UI"
+    def _SetIconData(self, data: bytes) -> None:
+        if not self:
+            return
+        self.SetIcons(wx.IconBundle(BytesIO(data), wx.BITMAP_TYPE_ICO))
+
+    def _init_deferred(self, xrc: str, is_bundled: bool) -> None:
+        if not self:
+            # closed before it was fully built
+            return
         try:
-            self.SetMenuBar(self.Xrc.LoadMenuBar("MainMenuBar"))
-
-            for name, cls in windows:
-                if not cls:
-                    continue
-                if name.startswith("plugin."):
-                    # mark as loaded after trying to build any plugin
-                    self.loaded = True
-                if issubclass(cls, BasePanel):
-                    panel = cls(parent=self.Notebook, frame=self)
-                    self.Windows[name] = panel
-                elif issubclass(cls, BaseFrame):
-                    frame = cls(parent=self, frame=self)
-                    self.Windows[name] = frame
-                else:
-                    warning(f"Unknown GUI element: {cls}")
-
-            self.loaded = True
+            self._init_windows(xrc, is_bundled)
         except Exception as e:
-            exception(f"Couldn't build {name}", exc_info=e)
-            if not self.loaded:
-                self.OnClose()
+            # reported by gui_entrypoint() after the main loop exits
+            self.init_exception = e
+            self.LoggingHandler.clear_emitters()
+            self.Destroy()
+            wx.GetApp().ExitMainLoop()
+            return
+        self.loaded = True
+        self.is_ready = True
+        if self.IsShown():
+            # the window was shown before it was built
+            self.OnShow()
+        self.ReleaseXrc()
+
+    def _init_windows(self, xrc: str, is_bundled: bool) -> None:
+        self.XrcPath = xrc
+
+        self.Log = LogPanel(parent=self.Splitter, frame=self)
+        self.Splitter.SplitHorizontally(self.Notebook, self.Log, sashPosition=-300)
+        self.Windows["log"] = self.Log
+
+        # list all built-in panels - these are imported and built on first activation
+        lazy_panels = [
+            ("flash", "Flashing", ".panels.flash", "FlashPanel"),
+            ("plugins", "Plugins", ".panels.plugins", "PluginsPanel"),
+            ("about", "About", ".panels.about", "AboutPanel"),
+        ]
+        if is_bundled:
+            lazy_panels = [p for p in lazy_panels if p[0] != "plugins"]
+        self.Notebook.Freeze()
+        for name, title, module, cls_name in lazy_panels:
+            placeholder = wx.Panel(parent=self.Notebook)
+            self.Notebook.AddPage(placeholder, title)
+            self.LazyPanels[name] = (placeholder, module, cls_name)
+            self._page_names[id(placeholder)] = name
+        self.Notebook.Thaw()
+
+        self.SetMenuBar(self.Xrc.LoadMenuBar("MainMenuBar"))
+
+        # build plugin GUIs in the background, add them on the main thread
+        lpm = LPM.get()
+        plugins = [
+            plugin
+            for plugin in sorted(lpm.plugins, key=lambda p: p.title)
+            if plugin.is_compatible and plugin.has_gui
+        ]
+        self._plugin_queue = []
+        if plugins:
+            executor = ThreadPoolExecutor(max_workers=min(8, len(plugins)))
+            for plugin in plugins:
+                future = executor.submit(plugin.build_gui)
+                self._plugin_queue.append((plugin, future))
+                future.add_done_callback(
+                    lambda _: wx.CallAfter(self._AddPluginWindows),
+                )
+            executor.shutdown(wait=False)
 
         # start zeroconf listener
         self.Zeroconf = Zeroconf()
 
+        self.RegisterMenuHandler("File", "Quit", self.OnQuitMenu)
+        self.RegisterMenuHandler("Debug", "Print settings", self.OnPrintSettingsMenu)
         self.UpdateMenus()
         for title in sorted(ColorPalette.get_titles(), key=lambda t: t.lower()):
             self.Menus["Colors"].AppendRadioItem(wx.ID_ANY, title)
+            self.RegisterMenuHandler("Colors", title, self.OnColorsMenu)
         self.UpdateMenus()
 
-        self.Bind(wx.EVT_SHOW, self.OnShow)
-        self.Bind(wx.EVT_CLOSE, self.OnClose)
-        self.Bind(wx.EVT_MENU, self.OnMenu)
-        self.Notebook.Bind(wx.EVT_NOTEBOOK_PAGE_CHANGING, self.OnPageChanging)
-        self.Notebook.Bind(wx.EVT_NOTEBOOK_PAGE_CHANGED, self.OnPageChanged)
-
-        self.SetSize((700, 800))
-        self.SetMinSize((600, 700))
-        self.SetIcon(wx.Icon(icon, wx.BITMAP_TYPE_ICO))
-        self.CreateStatusBar()
+    @property
+    def Xrc(self) -> wx.xrc.XmlResource:
+        if self._xrc is None:
+            # parsed again (and cached) if it was already released
+            self._xrc = load_xrc_file(self.XrcPath)
+        return self._xrc
+
+    def ReleaseXrc(self) -> None:
+        if self._xrc is None or self._plugin_queue:
+            # not loaded, or plugin windows are still going to be built
+            return
+        # panels built later (i.e. lazy panels) will parse the layout again
+        for window in self.Windows.values():
+            if isinstance(window, BasePanel):
+                window.ReleaseXrc(self._xrc)
+        unload_xrc_file(self.XrcPath)
+        self._xrc = None
 
     @property
     def _settings(self) -> dict:
-        return readjson(self.config_file) or {}
+        if self._settings_cache is None:
+            self._settings_cache = readjson(self.config_file) or {}
+            self._settings_hash = self._HashSettings(self._settings_cache)
+        return self._settings_cache
+
+    def _SaveSettings(self, value: dict, digest: bytes | None) -> None:
+        self._settings_cache = value
+        self._settings_hash = digest
+        # write to a temporary file first, to avoid leaving a partial file behind
+        writejson(self.config_file + ".tmp", value)
+        replace(self.config_file + ".tmp", self.config_file)
 
-    @_settings.setter
-    def _settings(self, value: dict):
-        writejson(self.config_file, value)
+    @staticmethod
+    def _HashSettings(value: dict) -> bytes | None:
+        try:
+            data = json.dumps(value, sort_keys=True, separators=(",", ":"))
+        except (TypeError, ValueError):
+            # not sortable (i.e. mixed key types) - always treat as changed
+            return None
+        return blake2b(data.encode(), digest_size=8).digest()
 
     # noinspection PyPropertyAccess
     def GetSettings(self) -> dict:
@@ -199,23 +292,126 @@ class MainFrame(wx.Frame):
 
     @NotebookPagePanel.setter
     def NotebookPagePanel(self, panel: BasePanel):
-        for i in range(self.Notebook.GetPageCount()):
-            if panel == self.Notebook.GetPage(i):
-                self.Notebook.SetSelection(i)
-                return
+        index = self._page_indexes.get(id(panel)) if self._page_indexes else None
+        if (
+            index is None
+            or index >= self.Notebook.GetPageCount()
+            or self.Notebook.GetPage(index) is not panel
+        ):
+            # pages were added or moved - rebuild the index
+            self._page_indexes = self._GetPageIds()
+            index = self._page_indexes.get(id(panel))
+        if index is not None:
+            self.Notebook.SetSelection(index)
+
+    def _GetPageIds(self) -> dict[int, int]:
+        return {
+            id(self.Notebook.GetPage(i)): i for i in range(self.Notebook.GetPageCount())
+        }
 
     @property
     def NotebookPageName(self) -> str:
-        for name, panel in self.Windows.items():
-            if panel == self.Notebook.GetCurrentPage():
-                return name
+        return self._page_names.get(id(self.Notebook.GetCurrentPage()))
 
     @NotebookPageName.setter
     def NotebookPageName(self, name: str):
+        if name in self.LazyPanels:
+            self.NotebookPagePanel = self.LazyPanels[name][0]
+            return
         panel = self.Windows.get(name, None)
         if isinstance(panel, BasePanel):
             self.NotebookPagePanel = panel
 
+    def LoadLazyPanel(self, name: str) -> BasePanel | None:
+        placeholder, module, cls_name = self.LazyPanels[name]
+        pages = self._GetPageIds()
+        panel = None
+        self._swapping_page = True
+        try:
+            cls = getattr(import_module(module, __package__), cls_name)
+            panel: BasePanel = cls(parent=self.Notebook, frame=self)
+            # the panel appends itself to the notebook; move it to the placeholder
+            last = self.Notebook.GetPageCount() - 1
+            title = self.Notebook.GetPageText(last)
+            self.Notebook.RemovePage(last)
+            index = self.Notebook.FindPage(placeholder)
+            selected = self.Notebook.GetSelection() == index
+            self.Notebook.InsertPage(index, panel, title)
+            if selected:
+                self.Notebook.ChangeSelection(index)
+            self.Notebook.DeletePage(index + 1)
+        except Exception as e:
+            exception(f"Couldn't build {name}", exc_info=e)
+            # remove pages left behind by the failed panel
+            for i in reversed(range(self.Notebook.GetPageCount())):
+                if id(self.Notebook.GetPage(i)) not in pages:
+                    self.Notebook.DeletePage(i)
+            if panel and self.Notebook.FindPage(panel) == wx.NOT_FOUND:
+                panel.Destroy()
+            # keep the empty placeholder, don't retry on every activation
+            self.LazyPanels.pop(name)
+            self.ReleaseXrc()
+            return None
+        finally:
+            self._swapping_page = False
+        self.LazyPanels.pop(name)
+        self.Windows[name] = panel
+        self._page_names.pop(id(placeholder), None)
+        self._page_names[id(panel)] = name
+        self._page_indexes = None
+        if self.is_shown:
+            self._ShowLateWindow(name, panel)
+        self.ReleaseXrc()
+        return panel
+
+    def _AddPluginWindows(self) -> None:
+        if not self:
+            # closed before plugins were built
+            return
+        if not (self._plugin_queue and self._plugin_queue[0][1].done()):
+            return
+        # add plugins in order, once all plugins before them are built
+        # (with the notebook frozen, to lay out the tabs only once)
+        self.Notebook.Freeze()
+        try:
+            while self._plugin_queue and self._plugin_queue[0][1].done():
+                plugin, future = self._plugin_queue.pop(0)
+                name = f"plugin.{plugin.namespace}"
+                try:
+                    for gui_name, cls in future.result().items():
+                        name = f"plugin.{plugin.namespace}.{gui_name}"
+                        if not cls:
+                            continue
+                        if issubclass(cls, BasePanel):
+                            window = cls(parent=self.Notebook, frame=self)
+                            self._page_names[id(window)] = name
+                        elif issubclass(cls, BaseFrame):
+                            window = cls(parent=self, frame=self)
+                        else:
+                            warning(f"Unknown GUI element: {cls}")
+                            continue
+                        self.Windows[name] = window
+                        if self.is_shown:
+                            self._ShowLateWindow(name, window)
+                except Exception as e:
+                    exception(f"Couldn't build {name}", exc_info=e)
+        finally:
+            self.Notebook.Thaw()
+        self.Notebook.SendSizeEvent()
+        self.ReleaseXrc()
+
+    def _ShowLateWindow(self, name: str, window: BaseWindow) -> None:
+        # the window missed OnShow(), so apply its settings now
+        window.SetSettings(**self._settings.get(name, {}))
+        window.SetInitParams(**self.init_params)
+        palette = ColorPalette.get()
+        window.OnPaletteChanged(palette, palette)
+        window.OnShow()
+        page = self._settings.get("main", {}).get("page")
+        # restore the saved page, unless the user already chose another one
+        if page == name and self.NotebookPageName == self._startup_page:
+            self.NotebookPageName = name
+
     def UpdateMenus(self) -> None:
         self.MenuBar: wx.MenuBar = self.GetMenuBar()
         self.Menus = {}
@@ -228,12 +424,11 @@ class MainFrame(wx.Frame):
                 item: wx.MenuItem
                 self.MenuItems[label][item.GetItemLabel()] = item
 
-    @staticmethod
-    def OnException(*args):
-        if isinstance(args[0], type):
-            exception(None, exc_info=args[1])
-        else:
-            exception(None, exc_info=args[0].exc_value)
+    def OnException(self, _, value: BaseException, __):
+        self.LoggingHandler.emit_exception(value)
+
+    def OnThreadException(self, args: threading.ExceptHookArgs):
+        self.LoggingHandler.emit_exception(args.exc_value)
 
     @staticmethod
     def ShowExceptionMessage(e, msg):
@@ -248,34 +443,54 @@ class MainFrame(wx.Frame):
         )
 
     def OnShow(self, *_):
+        if not self.is_ready:
+            # called again when the window is built
+            return
         settings = self._settings
-        self.SetSettings(**settings.get("main", {}))
-        for name, window in self.Windows.items():
-            window.SetSettings(**settings.get(name, {}))
-            window.SetInitParams(**self.init_params)
         if settings:
             info(f"Loaded settings from {self.config_file}")
+        main_settings = settings.get("main")
+        if main_settings:
+            self.SetSettings(**main_settings)
+        init_params = self.init_params
         for name, window in self.Windows.items():
+            window.SetSettings(**settings.get(name, {}))
+            window.SetInitParams(**init_params)
             window.OnShow()
+        self.is_shown = True
+        # build the initially selected page, if it wasn't activated yet
+        name = self._startup_page = self.NotebookPageName
+        if name in self.LazyPanels:
+            self.LoadLazyPanel(name)
 
     def OnClose(self, *_):
         if not self.loaded:
             # avoid writing partial settings in case of loading failure
             self.Destroy()
             return
+        # update the cached settings in place - they're already loaded in OnShow()
         settings = self._settings
         settings["main"] = self.GetSettings()
         for name, window in self.Windows.items():
             window.OnClose()
-            window_settings = window.GetSettings() or {}
+            window_settings = window.GetSettings()
             if window_settings:
                 settings[name] = window_settings
-        self._settings = settings
-        info(f"Saved settings to {self.config_file}")
+        digest = self._HashSettings(settings)
+        if digest is not None and digest == self._settings_hash:
+            info("Settings unchanged")
+        else:
+            try:
+                self._SaveSettings(settings, digest)
+                info(f"Saved settings to {self.config_file}")
+            except Exception as e:
+                exception("Couldn't save settings", exc_info=e)
         self.Destroy()
 
     @with_target
     def OnMenu(self, event: wx.CommandEvent, target: wx.Menu):
+        if not self.is_ready:
+            return
         if not isinstance(target, wx.Menu):
             # apparently EVT_MENU fires on certain key-presses too
             return
@@ -286,27 +501,43 @@ class MainFrame(wx.Frame):
         label = item.GetItemLabel()
         checked = item.IsChecked() if item.IsCheckable() else False
 
-        match (title, label):
-            case ("File", "Quit"):
-                self.Close(True)
+        handler = self._menu_handlers.get((title, label), None)
+        if handler:
+            handler(title, label, checked)
+            return
+        # fall back to panels handling menus by overriding OnMenu()
+        for panel in self.Windows.values():
+            if not isinstance(panel, BasePanel):
+                continue
+            if type(panel).OnMenu is BasePanel.OnMenu:
+                continue
+            panel.OnMenu(title, label, checked)
 
-            case ("Colors", _):
-                self.palette = label
+    def RegisterMenuHandler(
+        self,
+        title: str,
+        label: str,
+        handler: Callable[[str, str, bool], None],
+    ) -> None:
+        self._menu_handlers[title, label] = handler
 
-            case ("Debug", "Print settings"):
-                debug(f"Main settings: {self.GetSettings()}")
-                for name, window in self.Windows.items():
-                    debug(f"Window '{name}' settings: {window.GetSettings()}")
+    def OnQuitMenu(self, *_):
+        self.Close(True)
 
-            case _:
-                for panel in self.Windows.values():
-                    if isinstance(panel, BasePanel):
-                        panel.OnMenu(title, label, checked)
+    def OnColorsMenu(self, title: str, label: str, checked: bool):
+        self.palette = label
+
+    def OnPrintSettingsMenu(self, *_):
+        debug(f"Main settings: {self.GetSettings()}")
+        for name, window in self.Windows.items():
+            debug(f"Window '{name}' settings: {window.GetSettings()}")
 
     @with_event
     def OnPageChanging(self, event: wx.BookCtrlEvent):
+        if self._swapping_page or not self.is_ready:
+            return
         panel = self.NotebookPagePanel
-        if not panel:
+        if not isinstance(panel, BasePanel):
             return
         verbose(f"Deactivating page: {type(panel)}")
         if panel.OnDeactivate() is False:
@@ -314,8 +545,13 @@ class MainFrame(wx.Frame):
 
     @on_event
     def OnPageChanged(self):
+        if self._swapping_page or not self.is_ready:
+            return
+        name = self.NotebookPageName
+        if name in self.LazyPanels:
+            self.LoadLazyPanel(name)
         panel = self.NotebookPagePanel
-        if not panel:
+        if not isinstance(panel, BasePanel):
             return
         verbose(f"Activating page: {type(panel)}")
         panel.OnActivate()
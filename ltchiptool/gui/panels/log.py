@@ -134,6 +134,19 @@ class LogPanel(BasePanel):
 
         self.BindButton("button_donate_close", self.OnDonateClose)
 
+        for label in [
+            "Clear log window",
+            "Timed",
+            "Colors",
+            "Dump serial data",
+            "Verbose",
+            "Debug",
+            "Info",
+            "Warning",
+            "Error",
+        ]:
+            frame.RegisterMenuHandler("Logging", label, self.OnLoggingMenu)
+
     def emit_raw(self, log_prefix: str, message: str, color: str):
         if threading.current_thread() is not threading.main_thread():
             # NEVER block worker threads by waiting for main thread availability
@@ -224,9 +237,7 @@ class LogPanel(BasePanel):
         super().OnClose()
         LoggingHandler.get().clear_emitters()
 
-    def OnMenu(self, title: str, label: str, checked: bool):
-        if title != "Logging":
-            return
+    def OnLoggingMenu(self, title: str, label: str, checked: bool):
         match label:
             case "Clear log window":
                 self.Log.Clear()
@@ -1,11 +1,13 @@
 #  Copyright (c) Kuba Szczodrzyński 2023-1-3.
 
-from os.path import join
+from os.path import join, realpath
 from typing import Callable
 
 import wx
 import wx.xrc
 
+_xrc_cache: dict[str, wx.xrc.XmlResource] = {}
+
 
 def with_target(
     func: Callable[[object, wx.Event, wx.Window], None],
@@ -41,7 +43,17 @@ def int_or_zero(value: str) -> int:
 
 
 def load_xrc_file(*path: str) -> wx.xrc.XmlResource:
-    xrc = join(*path)
+    xrc = realpath(join(*path))
+    if xrc not in _xrc_cache:
+        _xrc_cache[xrc] = _load_xrc_file(xrc)
+    return _xrc_cache[xrc]
+
+
+def unload_xrc_file(*path: str) -> None:
+    _xrc_cache.pop(realpath(join(*path)), None)
+
+
+def _load_xrc_file(xrc: str) -> wx.xrc.XmlResource:
     try:
         with open(xrc, "r") as f:
             xrc_str = f.read()
@@ -7,6 +7,11 @@ from os import makedirs
 from os.path import dirname, getmtime, isfile, join
 from typing import IO, List, Optional, Union
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 def chname(path: str, name: str) -> str:
     """Change the basename of 'path' to 'name'."""
@@ -53,11 +58,18 @@ def readjson(file: str) -> Optional[Union[dict, list]]:
     """Read a JSON file into a dict or list."""
     if not isfile(file):
         return None
-    with open(file, "r", encoding="utf-8") as f:
+    with open(file, "rb") as f:
+        data = f.read()
+    if orjson:
         try:
-            return json.load(f)
-        except JSONDecodeError:
-            return None
+            return orjson.loads(data)
+        except orjson.JSONDecodeError:
+            # orjson is stricter (e.g. no NaN or big integers) - let json decide
+            pass
+    try:
+        return json.loads(data.decode("utf-8"))
+    except JSONDecodeError:
+        return None
 
 
 def writejson(file: str, data: Union[dict, list]):